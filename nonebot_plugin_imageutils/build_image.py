@@ -2,6 +2,7 @@ import cv2
 import numpy as np
 from io import BytesIO
 from pathlib import Path
+from functools import lru_cache
 from PIL import Image, ImageDraw
 from PIL.ImageColor import getrgb
 from PIL.Image import Image as IMG
@@ -13,10 +14,44 @@ from .types import *
 from .gradient import Gradient
 from .text2image import Text2Image
 
+# Pillow 9.1+ 提供 Image.Resampling，旧版本从 Image 模块取同名常量
+Resampling = getattr(Image, "Resampling", Image)
+
+
+# 超过该像素面积的纯色背景不进模板缓存，避免大画布长期驻留内存
+_BG_TEMPLATE_MAX_AREA = 512 * 512
+
+
+@lru_cache(maxsize=32)
+def _bg_template(mode: str, size: SizeType, color: ColorType) -> IMG:
+    """缓存纯色背景模板，重复的画布尺寸直接复制而不用重新填充"""
+    return Image.new(mode, size, color)  # type: ignore
+
+
+@lru_cache(maxsize=32)
+def _disk_mask(length: int) -> IMG:
+    """生成边缘抗锯齿的圆形遮罩"""
+    radius = length / 2
+    y, x = np.ogrid[:length, :length]
+    dist = np.sqrt((x + 0.5 - radius) ** 2 + (y + 0.5 - radius) ** 2)
+    alpha = np.clip(radius - dist + 0.5, 0, 1) * 255
+    return Image.fromarray(alpha.astype(np.uint8), "L")
+
+
+@lru_cache(maxsize=32)
+def _corner_mask(r: float) -> "np.ndarray":
+    """生成边缘抗锯齿的圆角遮罩（左上角）"""
+    size = int(r)
+    y, x = np.ogrid[:size, :size]
+    dist = np.sqrt((x + 0.5 - r) ** 2 + (y + 0.5 - r) ** 2)
+    alpha = np.clip(r - dist + 0.5, 0, 1) * 255
+    return alpha.astype(np.uint8)
+
 
 class BuildImage:
     def __init__(self, image: IMG):
         self.image = image
+        self._draw: Optional[Draw] = None
 
     @property
     def width(self) -> int:
@@ -36,7 +71,12 @@ class BuildImage:
 
     @property
     def draw(self) -> Draw:
-        return ImageDraw.Draw(self.image)
+        # 复用绘图对象，self.image 被替换后重新创建
+        draw = self._draw
+        if draw is None or draw.im is not self.image.im:
+            draw = ImageDraw.Draw(self.image)
+            self._draw = draw
+        return draw
 
     @classmethod
     def new(
@@ -54,7 +94,7 @@ class BuildImage:
     def resize(
         self,
         size: SizeType,
-        resample: ResampleType = Image.ANTIALIAS,
+        resample: ResampleType = Resampling.LANCZOS,
         keep_ratio: bool = False,
         inside: bool = False,
         direction: DirectionType = "center",
@@ -115,7 +155,13 @@ class BuildImage:
             x = 0
         elif direction in ["east", "northeast", "southeast"]:
             x = w - self.width
-        image = BuildImage.new(self.mode, size, bg_color)
+        if bg_color is None:
+            # 无背景色时 Image.new 只是一次 memset，没必要走模板缓存
+            image = BuildImage.new(self.mode, size)
+        elif w * h <= _BG_TEMPLATE_MAX_AREA:
+            image = BuildImage(_bg_template(self.mode, size, bg_color).copy())
+        else:
+            image = BuildImage.new(self.mode, size, bg_color)
         image.paste(self.image, (x, y))
         return image
 
@@ -130,7 +176,7 @@ class BuildImage:
     def rotate(
         self,
         angle: float,
-        resample: ResampleType = Image.BICUBIC,
+        resample: ResampleType = Resampling.BICUBIC,
         expand: bool = False,
         **kwargs,
     ) -> "BuildImage":
@@ -148,22 +194,24 @@ class BuildImage:
     def circle(self) -> "BuildImage":
         """将图片裁剪为圆形"""
         image = self.square().image.convert("RGBA")
-        mask = Image.new("L", (image.width * 5, image.height * 5), 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0, mask.width, mask.height), 255)
-        mask = mask.resize(image.size, Image.ANTIALIAS)
+        mask = _disk_mask(image.width)
         bg = Image.new("RGBA", image.size, (255, 255, 255, 0))
         return BuildImage(Image.composite(image, bg, mask))
 
     def circle_corner(self, r: float) -> "BuildImage":
         """将图片裁剪为圆角矩形"""
         image = self.image.convert("RGBA")
-        mask = Image.new("L", (image.width * 5, image.height * 5), 0)
-        draw = ImageDraw.Draw(mask)
-        draw.rounded_rectangle((0, 0, mask.width, mask.height), r * 5, fill=255)
-        mask = mask.resize(image.size, Image.ANTIALIAS)
+        r = min(r, image.width / 2, image.height / 2)
+        corner = _corner_mask(r)
+        size = corner.shape[0]
+        mask = np.full((image.height, image.width), 255, dtype=np.uint8)
+        if size:
+            mask[:size, :size] = corner
+            mask[:size, -size:] = corner[:, ::-1]
+            mask[-size:, :size] = corner[::-1, :]
+            mask[-size:, -size:] = corner[::-1, ::-1]
         bg = Image.new("RGBA", image.size, (255, 255, 255, 0))
-        return BuildImage(Image.composite(image, bg, mask))
+        return BuildImage(Image.composite(image, bg, Image.fromarray(mask)))
 
     def crop(self, box: BoxType) -> "BuildImage":
         """裁剪图片"""
@@ -192,8 +240,9 @@ class BuildImage:
             img = img.image
         new_img = Image.new(self.mode, self.size) if below else self.image.copy()
         if alpha:
-            img = img.convert("RGBA")
-            new_img.paste(img, pos, mask=img)
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+            new_img.paste(img, pos, mask=img.getchannel("A"))
         else:
             new_img.paste(img, pos)
         if below:
@@ -250,7 +299,7 @@ class BuildImage:
         coeffs = find_coeffs(points, p)
         return BuildImage(
             self.image.transform(
-                (new_w, new_h), Image.PERSPECTIVE, coeffs, Image.BICUBIC
+                (new_w, new_h), Image.PERSPECTIVE, coeffs, Resampling.BICUBIC
             )
         )
 
@@ -474,8 +523,8 @@ class BuildImage:
         top = xy[1]
         width = xy[2] - xy[0]
         height = xy[3] - xy[1]
-        fontsize = max_fontsize
-        while True:
+
+        def try_fontsize(fontsize: int) -> Optional[Text2Image]:
             text2img = Text2Image.from_text(
                 text,
                 fontsize,
@@ -490,31 +539,43 @@ class BuildImage:
                 fontname,
                 fallback_fonts,
             )
-            text_w = text2img.width
-            text_h = text2img.height
-            if text_w > width and allow_wrap:
+            if text2img.width > width and allow_wrap:
                 text2img.wrap(width)
-                text_w = text2img.width
-                text_h = text2img.height
-            if text_w > width or text_h > height:
-                fontsize -= 1
-                if fontsize < min_fontsize:
-                    raise ValueError("在指定的区域和字体大小范围内画不下这段文字")
+            if text2img.width > width or text2img.height > height:
+                return None
+            return text2img
+
+        # 在字体大小范围内二分查找能放下文字的最大字号
+        best: Optional[Text2Image] = None
+        lo = min_fontsize
+        hi = max_fontsize
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            text2img = try_fontsize(mid)
+            if text2img:
+                best = text2img
+                lo = mid + 1
             else:
-                x = left  # "left"
-                if halign == "center":
-                    x += (width - text_w) / 2
-                elif halign == "right":
-                    x += width - text_w
-
-                y = top  # "top"
-                if valign == "center":
-                    y += (height - text_h) / 2
-                elif valign == "bottom":
-                    y += height - text_h
-
-                text2img.draw_on_image(self.image, (x, y))
-                return self
+                hi = mid - 1
+        if not best:
+            raise ValueError("在指定的区域和字体大小范围内画不下这段文字")
+
+        text_w = best.width
+        text_h = best.height
+        x = left  # "left"
+        if halign == "center":
+            x += (width - text_w) / 2
+        elif halign == "right":
+            x += width - text_w
+
+        y = top  # "top"
+        if valign == "center":
+            y += (height - text_h) / 2
+        elif valign == "bottom":
+            y += height - text_h
+
+        best.draw_on_image(self.image, (x, y))
+        return self
 
     def draw_bbcode_text(
         self,
@@ -578,8 +639,8 @@ class BuildImage:
         top = xy[1]
         width = xy[2] - xy[0]
         height = xy[3] - xy[1]
-        fontsize = max_fontsize
-        while True:
+
+        def try_fontsize(fontsize: int) -> Optional[Text2Image]:
             text2img = Text2Image.from_bbcode_text(
                 text,
                 fontsize,
@@ -592,31 +653,43 @@ class BuildImage:
                 fontname,
                 fallback_fonts,
             )
-            text_w = text2img.width
-            text_h = text2img.height
-            if text_w > width and allow_wrap:
+            if text2img.width > width and allow_wrap:
                 text2img.wrap(width)
-                text_w = text2img.width
-                text_h = text2img.height
-            if text_w > width or text_h > height:
-                fontsize -= 1
-                if fontsize < min_fontsize:
-                    raise ValueError("在指定的区域和字体大小范围内画不下这段文字")
+            if text2img.width > width or text2img.height > height:
+                return None
+            return text2img
+
+        # 在字体大小范围内二分查找能放下文字的最大字号
+        best: Optional[Text2Image] = None
+        lo = min_fontsize
+        hi = max_fontsize
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            text2img = try_fontsize(mid)
+            if text2img:
+                best = text2img
+                lo = mid + 1
             else:
-                x = left  # "left"
-                if halign == "center":
-                    x += (width - text_w) / 2
-                elif halign == "right":
-                    x += width - text_w
-
-                y = top  # "top"
-                if valign == "center":
-                    y += (height - text_h) / 2
-                elif valign == "bottom":
-                    y += height - text_h
-
-                text2img.draw_on_image(self.image, (x, y))
-                return self
+                hi = mid - 1
+        if not best:
+            raise ValueError("在指定的区域和字体大小范围内画不下这段文字")
+
+        text_w = best.width
+        text_h = best.height
+        x = left  # "left"
+        if halign == "center":
+            x += (width - text_w) / 2
+        elif halign == "right":
+            x += width - text_w
+
+        y = top  # "top"
+        if valign == "center":
+            y += (height - text_h) / 2
+        elif valign == "bottom":
+            y += height - text_h
+
+        best.draw_on_image(self.image, (x, y))
+        return self
 
     def save(self, format: str, **params) -> BytesIO:
         output = BytesIO()
@@ -1,15 +1,19 @@
+import os
 import anyio
 import httpx
 import shutil
+import threading
 import traceback
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from PIL import ImageFont
+from itertools import chain
 from functools import lru_cache
 from fontTools.ttLib import TTFont
 from collections import namedtuple
 from PIL.ImageFont import FreeTypeFont
 from matplotlib.ft2font import FT2Font
-from typing import List, Union, Optional, Set, Iterator
+from typing import Dict, FrozenSet, List, Union, Optional, Set
 from matplotlib.font_manager import FontManager, FontProperties
 
 from .types import *
@@ -31,12 +35,22 @@ FONT_PATH = imageutils_config.custom_font_path
 font_manager = FontManager()
 
 
-def local_fonts() -> Iterator[str]:
+def _scan_local_fonts() -> Set[str]:
     if not FONT_PATH.exists():
-        return
-    for f in FONT_PATH.iterdir():
-        if f.is_file() and f.suffix in [".otf", ".ttf", ".ttc", ".afm"]:
-            yield f.name
+        return set()
+    return {
+        f.name
+        for f in FONT_PATH.iterdir()
+        if f.is_file() and f.suffix in [".otf", ".ttf", ".ttc", ".afm"]
+    }
+
+
+_local_fonts = _scan_local_fonts()
+
+
+def local_fonts() -> Set[str]:
+    """插件字体路径下的字体文件名，启动时扫描一次，添加字体时更新"""
+    return _local_fonts
 
 
 def add_font_to_manager(path: Union[str, Path]):
@@ -50,8 +64,68 @@ def add_font_to_manager(path: Union[str, Path]):
         logger.warning(f"Failed to extract font properties from {path}: {exc}")
 
 
-for fontname in local_fonts():
-    add_font_to_manager(FONT_PATH / fontname)
+# 字体解析主要是 C 层的工作，并行注册以缩短启动耗时；
+# add_font_to_manager 自行捕获异常，失败的字体只会记录警告
+if local_fonts():
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4)) as executor:
+        for fontname in local_fonts():
+            executor.submit(add_font_to_manager, FONT_PATH / fontname)
+
+
+SpecialFont = namedtuple("SpecialFont", ["family", "fontname", "valid_size"])
+"""不可缩放的特殊字体，只能以特定的大小加载"""
+
+SPECIAL_FONTS = {
+    "Apple Color Emoji": SpecialFont("Apple Color Emoji", "Apple Color Emoji.ttc", 160),
+    "Noto Color Emoji": SpecialFont("Noto Color Emoji", "NotoColorEmoji.ttf", 109),
+}
+
+_glyph_tables: Dict[Path, FrozenSet[int]] = {}
+_glyph_tables_lock = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def _load_truetype(fontpath: str, fontsize: int) -> FreeTypeFont:
+    return ImageFont.truetype(fontpath, fontsize, encoding="utf-8")
+
+
+@lru_cache()
+def _is_bitmap_font(fontpath: Path) -> bool:
+    """判断字体是否只含位图字形，这类字体只能以固定大小加载"""
+    try:
+        font = TTFont(fontpath, fontNumber=0, lazy=True)
+        tables = font.reader.tables
+        return any(tag in tables for tag in ("CBDT", "sbix", "EBDT", "bdat"))
+    except Exception:
+        # 解析失败时保守地按固定大小处理
+        return True
+
+
+@lru_cache()
+def _is_color_font(fontpath: Path) -> bool:
+    """判断字体是否含彩色字形表，这类字体需要按 embedded_color 绘制"""
+    try:
+        font = TTFont(fontpath, fontNumber=0, lazy=True)
+        tables = font.reader.tables
+        return any(tag in tables for tag in ("COLR", "CPAL", "CBDT", "sbix"))
+    except Exception:
+        # 解析失败时保守地按彩色字体处理，走常规绘制路径
+        return True
+
+
+def _load_glyph_table(fontpath: Path) -> FrozenSet[int]:
+    """解析字体文件的 cmap 表，同一字体文件只解析一次"""
+    with _glyph_tables_lock:
+        table = _glyph_tables.get(fontpath)
+        if table is None:
+            table = frozenset(
+                chain.from_iterable(
+                    t.cmap.keys()
+                    for t in TTFont(fontpath, fontNumber=0)["cmap"].tables  # type: ignore
+                )
+            )
+            _glyph_tables[fontpath] = table
+        return table
 
 
 class Font:
@@ -62,10 +136,7 @@ class Font:
         """字体文件路径"""
         self.valid_size = valid_size
         """某些字体不支持缩放，只能以特定的大小加载"""
-        self._glyph_table: Set[int] = set()
-        for table in TTFont(self.path, fontNumber=0)["cmap"].tables:  # type: ignore
-            for key in table.cmap.keys():
-                self._glyph_table.add(key)
+        self._glyph_table: Optional[FrozenSet[int]] = None
 
     @classmethod
     @lru_cache()
@@ -114,41 +185,40 @@ class Font:
     @classmethod
     def find_special_font(cls, family: str) -> Optional["Font"]:
         """查找特殊字体，主要是不可缩放的emoji字体"""
+        prop = SPECIAL_FONTS.get(family)
+        if prop is None:
+            return None
+        fontname = prop.fontname
+        valid_size = prop.valid_size
+        fontpath = None
+        if fontname in local_fonts():
+            fontpath = FONT_PATH / fontname
+        else:
+            try:
+                font = ImageFont.truetype(fontname, valid_size)
+                fontpath = Path(str(font.path))
+            except OSError:
+                pass
+        if fontpath:
+            if not _is_bitmap_font(fontpath):
+                # 同名的可缩放字体直接按目标大小加载，省去“放大渲染再缩小”
+                return cls(family, fontpath)
+            return cls(family, fontpath, valid_size)
 
-        SpecialFont = namedtuple("SpecialFont", ["family", "fontname", "valid_size"])
-        SPECIAL_FONTS = {
-            "Apple Color Emoji": SpecialFont(
-                "Apple Color Emoji", "Apple Color Emoji.ttc", 160
-            ),
-            "Noto Color Emoji": SpecialFont(
-                "Noto Color Emoji", "NotoColorEmoji.ttf", 109
-            ),
-        }
-
-        if family in SPECIAL_FONTS:
-            prop = SPECIAL_FONTS[family]
-            fontname = prop.fontname
-            valid_size = prop.valid_size
-            fontpath = None
-            if fontname in local_fonts():
-                fontpath = FONT_PATH / fontname
-            else:
-                try:
-                    font = ImageFont.truetype(fontname, valid_size)
-                    fontpath = Path(str(font.path))
-                except OSError:
-                    pass
-            if fontpath:
-                return cls(family, fontpath, valid_size)
+    def load_font(self, fontsize: int) -> FreeTypeFont:
+        """以指定大小加载字体，同一字体文件和字号共享加载结果"""
+        return _load_truetype(str(self.path), fontsize)
 
     @lru_cache()
-    def load_font(self, fontsize: int) -> FreeTypeFont:
-        """以指定大小加载字体"""
-        return ImageFont.truetype(str(self.path), fontsize, encoding="utf-8")
+    def is_color_font(self) -> bool:
+        """检查字体是否含彩色字形表"""
+        return _is_color_font(self.path)
 
     @lru_cache()
     def has_char(self, char: str) -> bool:
         """检查字体是否支持某个字符"""
+        if self._glyph_table is None:
+            self._glyph_table = _load_glyph_table(self.path)
         return ord(char) in self._glyph_table
 
 
@@ -206,6 +276,7 @@ async def add_font(fontname: str, source: Union[str, Path]):
         else:
             await download_font(source, fontpath)
         add_font_to_manager(fontpath)
+        _local_fonts.add(fontname)
     except:
         logger.warning(
             f"Add font {fontname} from {source} failed\n{traceback.format_exc()}"
@@ -219,5 +290,5 @@ async def download_font(url: str, fontpath: Path):
         async with client.stream("GET", url) as resp:
             logger.info(f"Begin to download font from {url}")
             async with await anyio.open_file(fontpath, "wb") as file:
-                async for chunk in resp.aiter_bytes():
+                async for chunk in resp.aiter_bytes(chunk_size=1024 * 256):
                     await file.write(chunk)
@@ -3,14 +3,124 @@ from bbcode import Parser
 from functools import lru_cache
 from PIL import Image, ImageDraw
 from PIL.Image import Image as IMG
+from PIL.ImageDraw import ImageDraw as Draw
 from PIL.ImageColor import colormap
-from typing import List, Optional, Iterator
+from typing import Dict, List, Optional, Iterator, Tuple
 
 from .types import *
 from .fonts import Font, get_proper_font
 
+# Pillow 9.1+ 提供 Image.Resampling，旧版本从 Image 模块取同名常量
+Resampling = getattr(Image, "Resampling", Image)
+
+# BBCode 标签参数的匹配模式，在模块加载时编译一次
+_ALIGN_PATTERN = re.compile(r"left|right|center")
+_COLOR_PATTERN = re.compile(r"#[a-fA-F0-9]{6}|" + "|".join(colormap.keys()))
+_STROKE_PATTERN = _COLOR_PATTERN
+_FONT_PATTERN = re.compile(r".+")
+_SIZE_PATTERN = re.compile(r"\d+")
+
+
+def _create_bbcode_parser() -> Parser:
+    parser = Parser()
+    parser.recognized_tags = {}
+    for tag in ("align", "color", "stroke", "font", "size", "b"):
+        parser.add_formatter(tag, None)
+    return parser
+
+
+_bbcode_parser = _create_bbcode_parser()
+
+
+class _ImagePool:
+    """复用尺寸相同的临时图片，减少渲染时的频繁分配"""
+
+    def __init__(self, max_per_size: int = 4):
+        self._buffers: Dict[Tuple[str, SizeType], List[IMG]] = {}
+        self._max_per_size = max_per_size
+
+    def get(self, mode: str, size: SizeType) -> IMG:
+        buffers = self._buffers.get((mode, size))
+        if buffers:
+            # 并发时 pop 可能落空，此时退回新建
+            try:
+                return buffers.pop()
+            except IndexError:
+                pass
+        return Image.new(mode, size)  # type: ignore
+
+    def put(self, img: IMG):
+        buffers = self._buffers.setdefault((img.mode, img.size), [])
+        if len(buffers) < self._max_per_size:
+            img.paste((0, 0, 0, 0), (0, 0, img.width, img.height))
+            buffers.append(img)
+
+
+_image_pool = _ImagePool()
+
+
+@lru_cache(maxsize=8192)
+def _char_metrics(
+    font: Font, fontsize: int, char: str, stroke_width: int
+) -> Tuple[int, int, int, int]:
+    """测量字符的 (ascent, descent, width, height)，相同字符只测量一次"""
+    pilfont = font.load_font(font.valid_size or fontsize)
+    ascent, descent = pilfont.getmetrics()
+    width, height = pilfont.getsize(char, stroke_width=stroke_width)
+    if font.valid_size:
+        ratio = fontsize / font.valid_size
+        ascent = round(ascent * ratio)
+        descent = round(descent * ratio)
+        width = round(width * ratio)
+        height = round(height * ratio)
+    return ascent, descent, width, height
+
+
+@lru_cache(maxsize=4096)
+def _glyph_mask(font: Font, fontsize: int, char: str) -> Tuple[IMG, PosTypeInt]:
+    """获取字符的灰度蒙版及偏移，蒙版在粘贴时上色，与填充颜色无关"""
+    pilfont = font.load_font(fontsize)
+    mask, offset = pilfont.getmask2(char, "L")
+    return Image.Image()._new(mask), offset
+
+
+@lru_cache(maxsize=2048)
+def _render_fixed_size_glyph(
+    font: Font, fontsize: int, char: str, fill: ColorType
+) -> IMG:
+    """渲染并缓存固定尺寸字体（emoji）的字符图片，重复字符直接粘贴"""
+    _, _, width, height = _char_metrics(font, fontsize, char, 0)
+    assert font.valid_size
+    ratio = font.valid_size / fontsize
+    buffer = _image_pool.get("RGBA", (int(width * ratio), int(height * ratio)))
+    draw = ImageDraw.Draw(buffer)
+    draw.text(
+        (0, 0),
+        char,
+        font=font.load_font(font.valid_size),
+        fill=fill,
+        embedded_color=True,
+    )
+    tile = buffer.resize((width, height), resample=Resampling.LANCZOS)
+    _image_pool.put(buffer)
+    return tile
+
 
 class Char:
+    __slots__ = (
+        "char",
+        "font",
+        "fontsize",
+        "fill",
+        "stroke_width",
+        "stroke_fill",
+        "pilfont",
+        "ascent",
+        "descent",
+        "width",
+        "height",
+    )
+
     def __init__(
         self,
         char: str,
@@ -29,42 +139,25 @@ class Char:
 
         if self.font.valid_size:
             self.stroke_width = 0
-            self.pilfont = self.font.load_font(self.font.valid_size)
-        else:
-            self.pilfont = self.font.load_font(fontsize)
+        self.pilfont = self.font.load_font(self.font.valid_size or fontsize)
 
-        self.ascent, self.descent = self.pilfont.getmetrics()
-        self.width, self.height = self.pilfont.getsize(
-            self.char, stroke_width=self.stroke_width
+        self.ascent, self.descent, self.width, self.height = _char_metrics(
+            self.font, fontsize, self.char, self.stroke_width
         )
 
+    def draw_on(self, img: IMG, pos: PosTypeInt, draw: Optional[Draw] = None):
         if self.font.valid_size:
-            ratio = fontsize / self.font.valid_size
-            self.ascent = round(self.ascent * ratio)
-            self.descent = round(self.descent * ratio)
-            self.width = round(self.width * ratio)
-            self.height = round(self.height * ratio)
-
-    def draw_on(self, img: IMG, pos: PosTypeInt):
-        if self.font.valid_size:
-            ratio = self.font.valid_size / self.fontsize
-            new_img = Image.new(
-                "RGBA", (int(self.width * ratio), int(self.height * ratio))
-            )
-            draw = ImageDraw.Draw(new_img)
-            draw.text(
-                (0, 0),
-                self.char,
-                font=self.pilfont,
-                fill=self.fill,
-                embedded_color=True,
+            tile = _render_fixed_size_glyph(
+                self.font, self.fontsize, self.char, self.fill
             )
-            new_img = new_img.resize(
-                (int(self.width), int(self.height)), resample=Image.ANTIALIAS
-            )
-            img.paste(new_img, pos, mask=new_img)
+            img.paste(tile, pos, mask=tile)
+        elif not self.stroke_width and not self.font.is_color_font():
+            # 灰度蒙版会丢掉彩色字形，仅对无彩色字形表的字体走蒙版缓存
+            mask, offset = _glyph_mask(self.font, self.fontsize, self.char)
+            img.paste(self.fill, (pos[0] + offset[0], pos[1] + offset[1]), mask)
         else:
-            draw = ImageDraw.Draw(img)
+            if draw is None:
+                draw = ImageDraw.Draw(img)
             draw.text(
                 pos,
                 self.char,
@@ -77,6 +170,18 @@ class Char:
 
 
 class Line:
+    __slots__ = (
+        "chars",
+        "align",
+        "fontsize",
+        "fontname",
+        "_width",
+        "_height",
+        "_ascent",
+        "_descent",
+        "_max_stroke_width",
+    )
+
     def __init__(
         self,
         chars: List[Char],
@@ -89,6 +194,34 @@ class Line:
         self.fontsize = fontsize
         self.fontname = fontname
 
+        # 构造时单次遍历计算各汇总值，属性访问无需反复遍历字符
+        width = 0
+        ascent = 0
+        descent = 0
+        top = 0
+        bottom = 0
+        max_stroke_width = 0
+        for char in chars:
+            stroke_width = char.stroke_width
+            width += char.width - stroke_width * 2
+            if char.ascent > ascent:
+                ascent = char.ascent
+            if char.descent > descent:
+                descent = char.descent
+            if char.ascent + stroke_width > top:
+                top = char.ascent + stroke_width
+            if char.descent + stroke_width > bottom:
+                bottom = char.descent + stroke_width
+            if stroke_width > max_stroke_width:
+                max_stroke_width = stroke_width
+        if chars:
+            width += chars[0].stroke_width + chars[-1].stroke_width
+        self._width = width
+        self._height = top + bottom
+        self._ascent = ascent
+        self._descent = descent
+        self._max_stroke_width = max_stroke_width
+
     @lru_cache(maxsize=None)
     def _char_a(self) -> Char:
         return Char(
@@ -97,53 +230,103 @@ class Line:
 
     @property
     def width(self) -> int:
-        if not self.chars:
-            return 0
-        return (
-            sum([char.width - char.stroke_width * 2 for char in self.chars])
-            + self.chars[0].stroke_width
-            + self.chars[-1].stroke_width
-        )
+        return self._width
 
     @property
     def height(self) -> int:
         if not self.chars:
             return self._char_a().height
-        return max([char.ascent + char.stroke_width for char in self.chars]) + max(
-            [char.descent + char.stroke_width for char in self.chars]
-        )
+        return self._height
 
     @property
     def ascent(self) -> int:
         if not self.chars:
             return self._char_a().ascent
-        return max([char.ascent for char in self.chars])
+        return self._ascent
 
     @property
     def descent(self) -> int:
         if not self.chars:
             return self._char_a().descent
-        return max([char.descent for char in self.chars])
+        return self._descent
 
     @property
     def max_stroke_width(self) -> int:
-        if not self.chars:
-            return 0
-        return max([char.stroke_width for char in self.chars])
+        return self._max_stroke_width
 
     def wrap(self, width: float) -> Iterator["Line"]:
-        last_idx = 0
-        for idx in range(len(self.chars)):
-            if Line(self.chars[last_idx : idx + 1]).width > width:
-                yield Line(self.chars[last_idx:idx], self.align)
-                last_idx = idx
-        yield Line(self.chars[last_idx:], self.align)
+        chars = self.chars
+        if not chars:
+            yield Line(chars, self.align)
+            return
+        start = 0
+        seg_width = 0  # 当前片段 [start, idx) 的累计宽度（不含两端描边）
+        start_stroke = chars[0].stroke_width
+        for idx, char in enumerate(chars):
+            eff_width = char.width - char.stroke_width * 2
+            if seg_width + eff_width + start_stroke + char.stroke_width > width:
+                yield Line(chars[start:idx], self.align)
+                start = idx
+                seg_width = 0
+                start_stroke = char.stroke_width
+            seg_width += eff_width
+        yield Line(chars[start:], self.align)
+
+    def draw_on(self, img: IMG, left: float, top: float, draw: Optional[Draw] = None):
+        chars = self.chars
+        if not chars:
+            return
+        # 字符宽高均为整数，坐标只在行首取整一次，循环内为纯整数运算
+        x = int(left) + chars[0].stroke_width
+        baseline = int(top) + self.ascent
+        if draw is None:
+            draw = ImageDraw.Draw(img)
+
+        # 将字体样式一致的相邻字符合并为一段，每段只需一次绘制调用
+        idx = 0
+        while idx < len(chars):
+            char = chars[idx]
+            end = idx
+            y = baseline - char.ascent
+            if char.font.valid_size:
+                char.draw_on(img, (x, y), draw)
+                x += char.width
+            else:
+                while (
+                    end + 1 < len(chars)
+                    and not chars[end + 1].font.valid_size
+                    and chars[end + 1].font is char.font
+                    and chars[end + 1].fontsize == char.fontsize
+                    and chars[end + 1].fill == char.fill
+                    and chars[end + 1].stroke_width == char.stroke_width
+                    and chars[end + 1].stroke_fill == char.stroke_fill
+                ):
+                    end += 1
+                if end == idx and not char.stroke_width:
+                    # 单个字符走蒙版缓存，重复出现时免去重新栅格化
+                    char.draw_on(img, (x, y), draw)
+                    x += char.width
+                else:
+                    run = chars[idx : end + 1]
+                    draw.text(
+                        (x, y),
+                        "".join(c.char for c in run),
+                        font=char.pilfont,
+                        fill=char.fill,
+                        stroke_width=char.stroke_width,
+                        stroke_fill=char.stroke_fill,
+                        embedded_color=True,
+                    )
+                    x += sum(c.width - c.stroke_width * 2 for c in run)
+            idx = end + 1
 
 
 class Text2Image:
     def __init__(self, lines: List[Line], spacing: int = 4):
         self.lines = lines
         self.spacing = spacing
+        self._width: Optional[int] = None
+        self._height: Optional[int] = None
 
     @classmethod
     def from_text(
@@ -187,18 +370,26 @@ class Text2Image:
 
         lines: List[Line] = []
         chars: List[Char] = []
+        font_cache: Dict[str, Font] = {}
 
         text = text.replace("\r\n", "\n").replace("\r", "\n")
+        # 字符循环内把常用的方法绑定为局部变量，省去循环内的属性查找
+        cache_get = font_cache.get
+        chars_append = chars.append
         for char in text:
             if char == "\n":
                 lines.append(Line(chars, align, fontsize, fontname))
                 chars = []
+                chars_append = chars.append
                 continue
             if font_fallback:
-                font = get_proper_font(char, style, weight, fontname, fallback_fonts)
+                font = cache_get(char)
+                if font is None:
+                    font = get_proper_font(char, style, weight, fontname, fallback_fonts)
+                    font_cache[char] = font
             else:
                 assert font
-            chars.append(Char(char, font, fontsize, fill, stroke_width, stroke_fill))
+            chars_append(Char(char, font, fontsize, fill, stroke_width, stroke_fill))
         if chars:
             lines.append(Line(chars, align, fontsize, fontname))
         return cls(lines, spacing)
@@ -249,6 +440,7 @@ class Text2Image:
 
         lines: List[Line] = []
         chars: List[Char] = []
+        font_cache: Dict[Tuple[str, bool, str], Font] = {}
 
         def new_line():
             nonlocal lines
@@ -264,40 +456,24 @@ class Text2Image:
         bold_stack: List[bool] = []
         last_align: HAlignType = align
 
-        align_pattern = r"left|right|center"
-        colors = "|".join(colormap.keys())
-        color_pattern = rf"#[a-fA-F0-9]{{6}}|{colors}"
-        stroke_pattern = color_pattern
-        font_pattern = r".+"
-        size_pattern = r"\d+"
-
-        parser = Parser()
-        parser.recognized_tags = {}
-        parser.add_formatter("align", None)
-        parser.add_formatter("color", None)
-        parser.add_formatter("stroke", None)
-        parser.add_formatter("font", None)
-        parser.add_formatter("size", None)
-        parser.add_formatter("b", None)
-
         text = text.replace("\r\n", "\n").replace("\r", "\n")
-        tokens = parser.tokenize(text)
+        tokens = _bbcode_parser.tokenize(text)
         for token_type, tag_name, tag_opts, token_text in tokens:
             if token_type == 1:
                 if tag_name == "align":
-                    if re.fullmatch(align_pattern, tag_opts["align"]):
+                    if _ALIGN_PATTERN.fullmatch(tag_opts["align"]):
                         align_stack.append(tag_opts["align"])
                 elif tag_name == "color":
-                    if re.fullmatch(color_pattern, tag_opts["color"]):
+                    if _COLOR_PATTERN.fullmatch(tag_opts["color"]):
                         color_stack.append(tag_opts["color"])
                 elif tag_name == "stroke":
-                    if re.fullmatch(stroke_pattern, tag_opts["stroke"]):
+                    if _STROKE_PATTERN.fullmatch(tag_opts["stroke"]):
                         stroke_stack.append(tag_opts["stroke"])
                 elif tag_name == "font":
-                    if re.fullmatch(font_pattern, tag_opts["font"]):
+                    if _FONT_PATTERN.fullmatch(tag_opts["font"]):
                         font_stack.append(tag_opts["font"])
                 elif tag_name == "size":
-                    if re.fullmatch(size_pattern, tag_opts["size"]):
+                    if _SIZE_PATTERN.fullmatch(tag_opts["size"]):
                         size_stack.append(int(tag_opts["size"]))
                 elif tag_name == "b":
                     bold_stack.append(True)
@@ -334,23 +510,32 @@ class Text2Image:
                     if chars:
                         new_line()
                     last_align = char_align
+                # 同一段文本共享样式，样式换算和方法查找移到字符循环外
+                char_size = int(char_size)
+                char_stroke_width = int(char_size * stroke_ratio)
+                cache_get = font_cache.get
+                chars_append = chars.append
                 for char in token_text:
                     if font_fallback:
-                        font = get_proper_font(
-                            char,
-                            weight="bold" if char_bold else "normal",
-                            fontname=char_font,
-                            fallback_fonts=fallback_fonts,
-                        )
+                        key = (char, char_bold, char_font)
+                        font = cache_get(key)
+                        if font is None:
+                            font = get_proper_font(
+                                char,
+                                weight="bold" if char_bold else "normal",
+                                fontname=char_font,
+                                fallback_fonts=fallback_fonts,
+                            )
+                            font_cache[key] = font
                     else:
                         assert font
-                    chars.append(
+                    chars_append(
                         Char(
                             char,
                             font,
-                            int(char_size),
+                            char_size,
                             char_color,
-                            int(char_size * stroke_ratio),
+                            char_stroke_width,
                             char_stroke,
                         )
                     )
@@ -360,29 +545,62 @@ class Text2Image:
 
         return cls(lines, spacing)
 
+    def _plain_layout(self) -> Optional[Tuple[str, Char]]:
+        """若全文靠左且共用同一字体、颜色、无描边，返回可整体绘制的文本和样板字符"""
+        lines = self.lines
+        if not lines:
+            return None
+        first: Optional[Char] = None
+        for line in lines:
+            if line.align != "left" or not line.chars:
+                return None
+            for char in line.chars:
+                if first is None:
+                    if char.stroke_width or char.font.valid_size:
+                        return None
+                    first = char
+                elif (
+                    char.font is not first.font
+                    or char.fontsize != first.fontsize
+                    or char.fill != first.fill
+                    or char.stroke_width
+                ):
+                    return None
+        assert first
+        text = "\n".join("".join(c.char for c in line.chars) for line in lines)
+        return text, first
+
     @property
     def width(self) -> int:
-        if not self.lines:
-            return 0
-        return max([line.width for line in self.lines])
+        if self._width is None:
+            if not self.lines:
+                self._width = 0
+            else:
+                self._width = max(line.width for line in self.lines)
+        return self._width
 
     @property
     def height(self) -> int:
-        if not self.lines:
-            return 0
-        return (
-            sum([line.ascent for line in self.lines])
-            + self.lines[-1].descent
-            + self.spacing * (len(self.lines) - 1)
-            + self.lines[0].max_stroke_width
-            + self.lines[-1].max_stroke_width
-        )
+        if self._height is None:
+            if not self.lines:
+                self._height = 0
+            else:
+                self._height = (
+                    sum(line.ascent for line in self.lines)
+                    + self.lines[-1].descent
+                    + self.spacing * (len(self.lines) - 1)
+                    + self.lines[0].max_stroke_width
+                    + self.lines[-1].max_stroke_width
+                )
+        return self._height
 
     def wrap(self, width: float) -> "Text2Image":
         new_lines: List[Line] = []
         for line in self.lines:
             new_lines.extend(line.wrap(width))
         self.lines = new_lines
+        self._width = None
+        self._height = None
         return self
 
     def to_image(
@@ -405,6 +623,25 @@ class Text2Image:
             bg_color,  # type: ignore
         )
 
+        draw = ImageDraw.Draw(img)
+
+        # 样式完全一致时整体交给 Pillow 绘制，免去逐行逐段的调用开销；
+        # Pillow 的行进距离为 getsize("A") 高度 + spacing，
+        # 换算使其等于逐行排版的 ascent + spacing
+        plain = self._plain_layout()
+        if plain is not None:
+            text, sample = plain
+            a_height = _char_metrics(sample.font, sample.fontsize, "A", 0)[3]
+            draw.multiline_text(
+                (padding_left, padding_top),
+                text,
+                font=sample.pilfont,
+                fill=sample.fill,
+                spacing=sample.ascent + self.spacing - a_height,
+                embedded_color=True,
+            )
+            return img
+
         top = padding_top
         for line in self.lines:
             left = padding_left
@@ -413,18 +650,13 @@ class Text2Image:
             elif line.align == "right":
                 left += self.width - line.width
 
-            x = left
-            if line.chars:
-                x += line.chars[0].stroke_width
-            for char in line.chars:
-                y = top + line.ascent - char.ascent
-                char.draw_on(img, (int(x), int(y)))
-                x += char.width - char.stroke_width * 2
+            line.draw_on(img, left, top, draw)
             top += line.ascent + self.spacing
 
         return img
 
     def draw_on_image(self, img: IMG, pos: PosTypeFloat):
+        draw = ImageDraw.Draw(img)
         top = pos[1]
         for line in self.lines:
             left = pos[0]
@@ -433,13 +665,7 @@ class Text2Image:
             elif line.align == "right":
                 left += self.width - line.width
 
-            x = left
-            if line.chars:
-                x += line.chars[0].stroke_width
-            for char in line.chars:
-                y = top + line.ascent - char.ascent
-                char.draw_on(img, (int(x), int(y)))
-                x += char.width - char.stroke_width * 2
+            line.draw_on(img, left, top, draw)
             top += line.ascent + self.spacing
 
 